@@ -9,8 +9,14 @@ This script plays with the display of such data.
 import datetime
 import itertools
 import logging
+from collections import defaultdict
+import numpy as np
+from bokeh.io import save
 from bokeh.plotting import figure, show, output_file
 
+# Midnight at the start of today, which datetime.time instances are anchored to.
+_TODAY = datetime.datetime.combine(datetime.date.today(), datetime.time())
+
 class Event:
     """
     An event for us to handle/plot
@@ -26,26 +32,60 @@ class Event:
         self.id = next(Event.counter)
         self.description = description
         self.owner = owner
-        self.schedule = []
+        self._starts = np.empty(0, dtype='datetime64[us]')
+        self._durations = np.empty(0, dtype='timedelta64[us]')
+        self._pending_starts = []
+        self._pending_durations = []
+        self._start_set = set()
 
     def __repr__(self):
-        return "[{}] Event: {} Owner: {} Occurrences: {}".format(self.id, self.description, self.owner, len(self.schedule))
+        return "[{}] Event: {} Owner: {} Occurrences: {}".format(self.id, self.description, self.owner, len(self._start_set))
 
     def __lt__(self, other):
-        if self.schedule and other.schedule:
-            if self.schedule[0].start == other.schedule[0].start:
+        if self._start_set and other._start_set:
+            first, other_first = self.starts[0], other.starts[0]
+            if first == other_first:
                 if self.owner == other.owner:
                     return self.description < other.description
                 else:
                     return self.owner < other.owner
             else:
-                return self.schedule[0].start < other.schedule[0].start
+                return first < other_first
         else:
             return self.owner < other.owner
 
     def __iter__(self):
-        for t in sorted(self.schedule):
-            yield t
+        for start, duration in zip(self.starts.tolist(), self.durations.tolist()):
+            yield Instance(start, duration)
+
+    @property
+    def starts(self):
+        """
+        Start times of the instances in order (numpy datetime64[us] array)
+        """
+        self._flush()
+        return self._starts
+
+    @property
+    def durations(self):
+        """
+        Durations of the instances in start time order (numpy timedelta64[us] array,
+        NaT where the instance has no duration)
+        """
+        self._flush()
+        return self._durations
+
+    def _flush(self):
+        """
+        Moves any instances added since the last flush in to the arrays and sorts them.
+        Doing this once when the arrays are read is cheaper than on every AddInstance.
+        """
+        if self._pending_starts:
+            starts = np.concatenate((self._starts, np.array(self._pending_starts, dtype='datetime64[us]')))
+            durations = np.concatenate((self._durations, np.array(self._pending_durations, dtype='timedelta64[us]')))
+            order = np.argsort(starts, kind='stable')
+            self._starts, self._durations = starts[order], durations[order]
+            self._pending_starts, self._pending_durations = [], []
 
     def AddInstance(self, time, duration=None):
         """
@@ -54,19 +94,19 @@ class Event:
         :param duration:
         :return:
         """
-        if type(time) is datetime.time:
-            time = datetime.datetime.combine(datetime.datetime.today(), time)
-        if type(time) is datetime.datetime:
-            if self.schedule and time < self.schedule[-1].start:
-                logging.warning('Inserting event in to {} at {} when last entry is {}'.format(
-                                            self.description, time, self.schedule[-1].start))
-            if time in [i.start for i in self.schedule]:
-                logging.warning('Event {} already has an entry for {}. Ignoring'.format(self.description, time))
-            else:
-                self.schedule.append(Instance(time, duration))
-                self.schedule.sort()
+        if isinstance(time, datetime.datetime):
+            pass
+        elif isinstance(time, datetime.time):
+            time = datetime.datetime.combine(_TODAY, time)
         else:
-            logging.error('Schedule entries must be of type datetime.datetime')
+            logging.error('Schedule entries must be of type datetime.datetime or datetime.time')
+            return
+        if time in self._start_set:
+            logging.warning('Event {} already has an entry for {}. Ignoring'.format(self.description, time))
+            return
+        self._start_set.add(time)
+        self._pending_starts.append(time)
+        self._pending_durations.append(duration)
 
 
 class Instance:
@@ -95,14 +135,14 @@ class Owner:
     The owner of an event. Colours and shapes are for plotting on
     the timeline using Bokeh
     """
-    colours = itertools.cycle(["red", "yellow", "green", "blue", "cyan", "magenta"])
+    colours = ("red", "yellow", "green", "blue", "cyan", "magenta")
     counter = itertools.count()
 
     def __init__(self, name, rank=100):
         self.id = next(Owner.counter)
         self.name = name
         self.rank = rank
-        self.colour = next(Owner.colours)
+        self.colour = Owner.colours[self.id % len(Owner.colours)]
 
     def __repr__(self):
         return "[{}] {} {}".format(self.id, self.name, self.rank)
@@ -113,31 +153,61 @@ class Owner:
         else:
             return self.rank < other.rank
 
-def PlotEvents(events, filename, title):
+def _event_key(event):
+    """
+    Sort key for events: first start time (events with no instances last), then owner, then description.
+    Computed once per event, which is much cheaper than sorting with Event.__lt__.
+    """
+    starts = event.starts
+    first = starts[0] if len(starts) else np.datetime64(datetime.datetime.max, 'us')
+    return first, event.owner.rank, event.owner.name, event.description
+
+def PlotEvents(events, filename, title, show_in_browser=False):
     AspectRatio = 16/9
     EventHeight = 50
     TitleHeight = 50
     EventSizeRatio = 1/3
 
-    events = sorted(events)
+    # Bokeh draws categories bottom up, so work through the events in reverse order.
+    rev = sorted(events, key=_event_key, reverse=True)
     output_file(filename, title=title)
 
-    height = int(TitleHeight + EventHeight * len(events))
+    height = int(TitleHeight + EventHeight * len(rev))
     width  = int(height*AspectRatio)
     p = figure(plot_width=width, plot_height=height, title=title,
-               x_axis_type="datetime", y_range=[event.description for event in reversed(events)])
+               x_axis_type="datetime", y_range=[event.description for event in rev])
     size = EventHeight*EventSizeRatio
-    for index, event in enumerate(reversed(events)):
+    # Gather the instances up per owner so that each owner gets a single glyph
+    # renderer (and legend entry) rather than one per instance.
+    bars = defaultdict(lambda: {'left': [], 'right': [], 'y': []})
+    points = defaultdict(lambda: {'x': [], 'y': []})
+    for index, event in enumerate(rev):
         y = index + 0.5
-        for instance in event.schedule:
-            if instance.duration:
-                p.hbar(left=instance.start, right=instance.end, y=y, height=EventSizeRatio,
-                       line_color="black", fill_color=event.owner.colour,
-                       alpha=0.75, legend=event.owner.name)
-            else:
-                p.diamond(y=y, x=instance.start, line_color="black", fill_color=event.owner.colour, size=size,
-                          alpha=0.75, legend=event.owner.name)
-    show(p)
+        starts, durations = event.starts, event.durations
+        has_duration = ~np.isnat(durations) & (durations != np.timedelta64(0))
+        bar, point = bars[event.owner], points[event.owner]
+        bar['left'].append(starts[has_duration])
+        bar['right'].append(starts[has_duration] + durations[has_duration])
+        bar['y'].append(np.full(np.count_nonzero(has_duration), y))
+        point['x'].append(starts[~has_duration])
+        point['y'].append(np.full(len(starts) - np.count_nonzero(has_duration), y))
+    for owner, bar in bars.items():
+        left = np.concatenate(bar['left'])
+        if not len(left):
+            continue
+        p.hbar(left=left, right=np.concatenate(bar['right']), y=np.concatenate(bar['y']), height=EventSizeRatio,
+               line_color="black", fill_color=owner.colour,
+               alpha=0.75, legend_label=owner.name)
+    for owner, point in points.items():
+        x = np.concatenate(point['x'])
+        if not len(x):
+            continue
+        p.diamond(x=x, y=np.concatenate(point['y']), line_color="black", fill_color=owner.colour, size=size,
+                  alpha=0.75, legend_label=owner.name)
+    if show_in_browser:
+        show(p)
+    else:
+        save(p)
 
 if __name__ == '__main__':
 
@@ -155,4 +225,4 @@ if __name__ == '__main__':
     events[-1].AddInstance(datetime.time(3,0))
     events[-1].AddInstance(datetime.time(4,0), datetime.timedelta(hours=2))
     events[-2].AddInstance(datetime.time(5,30), datetime.timedelta(minutes=30))
-    PlotEvents(events, 'events.html', 'Stuff happening')
+    PlotEvents(events, 'events.html', 'Stuff happening', show_in_browser=True)
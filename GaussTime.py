@@ -7,31 +7,59 @@ import datetime
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from numba import njit
+from matplotlib.lines import Line2D
 
 DAYS_PER_YEAR = 365
 SIGMA = 1800
 MAX_POINTS_PER_DAY = 10
 
-times = []
-
 start = datetime.date(2017, 1, 1)
 colours = {'Seagrave': 'red', 'Athorpe': 'yellow', 'Hatfield': 'green', 'Osborne': 'blue'}
-for d in range(DAYS_PER_YEAR):
-    date = start + datetime.timedelta(days=d)
-    for i in range(np.random.randint(MAX_POINTS_PER_DAY)):
-        t = datetime.datetime.combine(date, datetime.time(18, 0, 0)) + datetime.timedelta(seconds=np.random.normal(0.0, SIGMA))
-        c = np.random.choice(list(colours.keys()), p=[0.4, 0.4, 0.1, 0.1])
-        times.append({'start': t, 'colour': c})
-df = pd.DataFrame(times)
-df['datetime'] = df['start'].astype(datetime.datetime)
-df['time'] = df['start'].dt.hour + df['start'].dt.minute/60
+probabilities = [0.4, 0.4, 0.1, 0.1]
+
+
+@njit(cache=True)
+def gen(days, max_ppd, sigma, seed, cum_probs):
+    """
+    Generates the random events as seconds since the start date along with the index of
+    each event's colour. Arrays are allocated for the worst case and sliced on return.
+    :param days: Number of days to generate events for
+    :param max_ppd: Upper bound (exclusive) of the number of events per day
+    :param sigma: Standard deviation (seconds) of the events around 18:00
+    :param seed: Seed for the random number generator
+    :param cum_probs: Cumulative probabilities of each colour
+    :return: (int64 seconds since start, uint8 colour indices)
+    """
+    np.random.seed(seed)
+    starts = np.empty(days * max_ppd, dtype=np.int64)
+    colour_idx = np.empty(days * max_ppd, dtype=np.uint8)
+    n = 0
+    for day in range(days):
+        base_sec = day * 86400 + 18 * 3600
+        for i in range(np.random.randint(0, max_ppd)):
+            starts[n] = base_sec + int(np.random.normal(0.0, sigma))
+            r = np.random.random()
+            c = 0
+            while c < len(cum_probs) - 1 and r >= cum_probs[c]:
+                c += 1
+            colour_idx[n] = c
+            n += 1
+    return starts[:n], colour_idx[:n]
+
+
+starts, colour_idx = gen(DAYS_PER_YEAR, MAX_POINTS_PER_DAY, SIGMA, np.random.randint(2**31),
+                         np.cumsum(probabilities))
+df = pd.DataFrame({'start': pd.to_datetime(starts, unit='s', origin=pd.Timestamp(start)),
+                   'colour': np.array(list(colours.keys()))[colour_idx]})
+secs = df['start'].values.astype('datetime64[s]').astype('int64') % 86400
+df['time'] = secs / 3600.0
+c_array = df['colour'].map(colours).to_numpy()
 fig, ax = plt.subplots()
 #ax.set_ylim([0,23])
 plt.yticks(range(24), ["{}:00".format(h) for h in range(24)])
-for house, colour in colours.items():
-    df2 = df[df['colour'] == house]
-    plt.plot(df2['datetime'], df2['time'], '.', color=colour)
-plt.legend(colours)
+ax.scatter(df['start'].values, df['time'].values, c=c_array, marker='.', s=4, linewidths=0)
+plt.legend([Line2D([], [], marker='.', linestyle='', color=colour) for colour in colours.values()], colours)
 plt.grid(which='both', linestyle=':', color='grey')
 plt.suptitle('Random event simulation')
 plt.title('\N{GREEK SMALL LETTER SIGMA} = {}'.format(SIGMA))